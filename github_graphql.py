@@ -0,0 +1,213 @@
+"""
+@file github_graphql.py
+@brief send queries to GitHub's GraphQL API
+@details
+Sessions with pooled connections and retries for server errors, and a
+query function that shares GitHub's rate limit between threads; used
+by pre_commit_checker.py to scan an organization.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+from dotenv import load_dotenv
+from github.GithubException import GithubException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # orjson parses the (large) GraphQL responses several times faster
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+load_dotenv()
+
+##
+# @var str GRAPHQL_URL
+# @brief the URL to the GraphQL API; derived from API_URL by default
+# @details
+# GitHub Enterprise Server serves REST from /api/v3 and GraphQL from
+# /api/graphql, so the trailing /v3 (if any) is dropped.
+GRAPHQL_URL = os.getenv(
+    "GRAPHQL_URL",
+    re.sub(r"/v3/?$", "", os.getenv("API_URL", "https://api.github.com")) + "/graphql",
+)
+
+##
+# @var int RATE_LIMIT_ATTEMPTS
+# @brief how many times to send a GraphQL query that's being rate limited (at least 1)
+RATE_LIMIT_ATTEMPTS = max(1, int(os.getenv("RATE_LIMIT_ATTEMPTS", "3")))
+
+##
+# @var int SERVER_ERROR_RETRIES
+# @brief how many times to retry a GraphQL query that failed with a 502, 503, or 504
+# @details
+# Mutations are only retried when no connection could be made, so a
+# lost response can't turn into a duplicate issue.
+SERVER_ERROR_RETRIES = int(os.getenv("SERVER_ERROR_RETRIES", "5"))
+
+##
+# @var logging.Logger log
+# @brief this module's logger
+log = logging.getLogger(__name__)
+
+##
+# @var threading.Lock RATE_LIMIT_LOCK
+# @brief guards RATE_LIMIT_STATE
+RATE_LIMIT_LOCK = threading.Lock()
+
+##
+# @var dict RATE_LIMIT_STATE
+# @brief when (as a time.time()) GraphQL queries may be sent again
+# @details
+# Shared by every thread so once one response says to back off, none
+# of them send another query until then.
+RATE_LIMIT_STATE = {"resume_at": 0.0}
+
+##
+# @var int SECONDARY_RATE_LIMIT_DELAY
+# @brief seconds to wait after a 403 or 429 that doesn't say how long
+# @details
+# GitHub often leaves `Retry-After` off secondary rate limit responses
+# and asks clients to wait at least a minute before trying again.
+SECONDARY_RATE_LIMIT_DELAY = 60
+
+
+def rate_limit_delay(headers, status_code=200):
+    """
+    @fn rate_limit_delay()
+    @brief determine how long GitHub wants us to wait before the next request
+    @details
+    GitHub sends `Retry-After` for secondary rate limits and
+    `X-RateLimit-Remaining` / `X-RateLimit-Reset` with every response;
+    return how long either says to wait (0 while there's budget left).
+    A 403 or 429 that says neither waits SECONDARY_RATE_LIMIT_DELAY.
+    @param headers the headers of the most recent response
+    @param status_code the HTTP status of the most recent response
+    @returns the number of seconds to wait (0 if there's no need)
+    @par Example
+    @code
+    time.sleep(rate_limit_delay(response.headers, response.status_code))
+    @endcode
+    """
+
+    if "Retry-After" in headers:
+        return max(0.0, float(headers["Retry-After"]))
+
+    if headers.get("X-RateLimit-Remaining") == "0":
+        return max(0.0, float(headers.get("X-RateLimit-Reset", "0")) - time.time())
+
+    if status_code in (403, 429):
+        return float(SECONDARY_RATE_LIMIT_DELAY)
+
+    return 0.0
+
+
+def graphql_session(pat, pool_size=10, idempotent=True):
+    """
+    @fn graphql_session()
+    @brief create a requests.Session for talking to the GraphQL API
+    @details
+    The pool should keep a connection for each thread using the session
+    so they don't each pay for a new TLS handshake.  Every GraphQL
+    request is a POST, so 502, 503, and 504 responses are only retried
+    (see SERVER_ERROR_RETRIES) when the requests are `idempotent`.
+    @param pat the Personal Access Token to authenticate with
+    @param pool_size how many connections to keep open
+    @param idempotent False if the session will be used for mutations
+    @returns a requests.Session carrying the Authorization header
+    @par Example
+    @code
+    data = graphql_query(graphql_session(PAT), BLOBS_QUERY, {"ids": blob_ids})
+    @endcode
+    """
+
+    allowed_methods = Retry.DEFAULT_ALLOWED_METHODS
+    if idempotent:
+        allowed_methods |= {"POST"}
+
+    retry = Retry(
+        total=SERVER_ERROR_RETRIES,
+        backoff_factor=1,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=allowed_methods,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.headers.update({"Authorization": f"bearer {pat}"})
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+def graphql_query(session, query, variables, partial=False):
+    """
+    @fn graphql_query()
+    @brief POST a query to the GraphQL API and return its data
+    @details
+    HTTP errors and GraphQL errors (which GitHub returns with a 200
+    status) are both raised as a GithubException.  When a response says
+    to back off (see rate_limit_delay()), including a 403 or 429 that
+    doesn't say for how long, every thread waits (see RATE_LIMIT_STATE)
+    and a refused query is retried, up to RATE_LIMIT_ATTEMPTS times.
+    With `partial`, whatever data came back is returned even if some
+    fields failed, so a batch of mutations that partly succeeded isn't
+    lost or retried.
+    @param session the requests.Session to use
+    @param query the GraphQL query document
+    @param variables a dictionary of the query's variables
+    @param partial return the data even if some fields had errors
+    @returns the "data" member of the response
+    @par Example
+    @code
+    data = graphql_query(session, BLOBS_QUERY, {"ids": blob_ids})
+    @endcode
+    """
+
+    for attempt in range(1, RATE_LIMIT_ATTEMPTS + 1):
+        with RATE_LIMIT_LOCK:
+            wait = RATE_LIMIT_STATE["resume_at"] - time.time()
+
+        if wait > 0:
+            log.info("waiting %.1f seconds for the rate limit", wait)
+            time.sleep(wait)
+
+        response = session.post(
+            GRAPHQL_URL, json={"query": query, "variables": variables}, timeout=60
+        )
+
+        try:
+            payload = json_loads(response.content)
+        except ValueError:
+            payload = None
+
+        delay = rate_limit_delay(response.headers, response.status_code)
+
+        if delay > 0:
+            with RATE_LIMIT_LOCK:
+                resume_at = max(RATE_LIMIT_STATE["resume_at"], time.time() + delay)
+                RATE_LIMIT_STATE["resume_at"] = resume_at
+
+        if response.status_code == 200 and payload is not None:
+            if not payload.get("errors"):
+                return payload["data"]
+
+            if partial and payload.get("data"):
+                for error in payload["errors"]:
+                    log.error("GraphQL error: %s", error.get("message"))
+                return payload["data"]
+
+        if delay == 0 or attempt == RATE_LIMIT_ATTEMPTS:
+            break
+
+        log.warning("rate limited; retrying in %.1f seconds", delay)
+
+    raise GithubException(response.status_code, payload, dict(response.headers))
@@ -14,18 +14,22 @@ a pre-commit configuration file; if not, it will print
 a message (eventually it'll create an issue).
 """
 
-import base64
+import functools
+import json
 import logging
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-import yaml
 from dotenv import load_dotenv
 from github import Github
-from github.GithubException import GithubException, UnknownObjectException
-from jinja2 import Environment, FileSystemLoader
+from github.GithubException import GithubException
+from github.GithubObject import NotSet
+
+from github_graphql import graphql_query, graphql_session
 
 load_dotenv()
 
@@ -51,22 +55,53 @@ API_URL = os.getenv("API_URL", "https://api.github.com")
 
 ##
 # @var float DELAY
-# @brief the number of seconds to wait between API calls
+# @brief the minimum number of seconds between requests that update a repository
 DELAY = float(os.getenv("DELAY", "3"))
 
+##
+# @var int MAX_WORKERS
+# @brief the number of repositories to process concurrently (at least 1)
+MAX_WORKERS = max(1, int(os.getenv("MAX_WORKERS") or "10"))
+
+##
+# @var str CACHE_FILENAME
+# @brief where to keep config validation results between runs; empty to disable
+# @details
+# Results are keyed by git blob id, which changes whenever the contents
+# do, so a cached result never needs to be revalidated.
+CACHE_FILENAME = os.path.expanduser(os.getenv("CACHE_FILENAME", ""))
+
+##
+# @var str OUTPUT_FORMAT
+# @brief how to report each repository; "text" (default) or "jsonl"
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "text").lower()
+
+##
+# @var int ISSUE_BATCH_SIZE
+# @brief how many issues to create with a single GraphQL request
+ISSUE_BATCH_SIZE = int(os.getenv("ISSUE_BATCH_SIZE", "20"))
+
 ##
 # @var int LOG_LEVEL
 # @brief the threshold for displaying logs; higher is quieter
-LOG_LEVEL = int(os.getenv("LOGGING", "20"))
+# @details
+# LOGGING (which older versions read) is used if LOG_LEVEL is unset or
+# empty (e.g., an undefined variable in sample-runner.yml).
+LOG_LEVEL = int(os.getenv("LOG_LEVEL") or os.getenv("LOGGING") or "20")
 
 logging.basicConfig(level=LOG_LEVEL)
 
+##
+# @var logging.Logger log
+# @brief this module's logger
+log = logging.getLogger(__name__)
+
 if PAT is None:
-    logging.critical("PAT was undefined")
+    log.critical("PAT was undefined")
     sys.exit(1)
 
 if ORG is None:
-    logging.critical("ORG was undefined")
+    log.critical("ORG was undefined")
     sys.exit(1)
 
 ##
@@ -80,13 +115,26 @@ if ORG is None:
 # issue in the event of a (still) missing / invalid
 # pre-commit configuration file.  It doesn't look at
 # author or labels or assignees or special strings;
-# it just looks for this exact title.
-MISSING_ISSUE_TITLE = re.sub(
-    r"[^\w\s]+",
-    "",
-    os.getenv("MISSING_ISSUE_TITLE", "Missing or invalid pre-commit configuration"),
+# it just looks for this exact title.  It's interned since it's
+# looked up in every repository's index of open issues.
+MISSING_ISSUE_TITLE = sys.intern(
+    re.sub(
+        r"[^\w\s]+",
+        "",
+        os.getenv("MISSING_ISSUE_TITLE", "Missing or invalid pre-commit configuration"),
+    ).strip()
 )
 
+##
+# @var str ISSUE_LABEL
+# @brief a label to put on issues created by this tool; empty for none
+# @details
+# When set, only open issues with this label are considered when
+# looking for MISSING_ISSUE_TITLE, so label existing issues by hand
+# when turning this on.  Quotes and backslashes are removed since the
+# label is quoted in issue searches.
+ISSUE_LABEL = re.sub(r'["\\]', "", os.getenv("ISSUE_LABEL", "")).strip()
+
 ##
 # @var str PRE_COMMIT_CONFIG_FILENAME
 # @brief the name of the file to look for
@@ -112,6 +160,82 @@ CLOSE_ISSUE_BODY_FILENAME = os.getenv("CLOSE_ISSUE_FILENAME", "close-issue.j2")
 TEMPLATES_DIRECTORY = os.getenv("TEMPLATES_DIRECTORY", "templates")
 
 
+##
+# @var threading.Lock WRITE_LOCK
+# @brief serializes the operations that create or close issues
+# @details
+# GitHub asks that requests which modify content be made serially; the
+# Github object spaces those writes at least DELAY seconds apart, and
+# create_issues() paces its batches at DELAY seconds per issue.
+WRITE_LOCK = threading.Lock()
+
+##
+# @var str REPOSITORIES_QUERY
+# @brief GraphQL query for one page of an organization's repositories
+# @details
+# Archived repositories are filtered out by GitHub; disabled and empty
+# ones are dropped by fetch_org_state().  Each repository comes back
+# with its config blob, its open issues, and what's needed to create an
+# issue, so a page of 100 repositories costs a single request.
+REPOSITORIES_QUERY = """
+query(
+  $org: String!, $cursor: String, $expression: String!, $labels: [String!], $label: String!
+) {
+  organization(login: $org) {
+    repositories(first: 100, after: $cursor, isArchived: false) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        id
+        name
+        nameWithOwner
+        isDisabled
+        isEmpty
+        hasIssuesEnabled
+        label(name: $label) { id }
+        object(expression: $expression) { ... on Blob { id oid byteSize } }
+        issues(states: OPEN, first: 100, labels: $labels) {
+          pageInfo { hasNextPage endCursor }
+          nodes { number title }
+        }
+      }
+    }
+  }
+}
+"""
+
+##
+# @var str SEARCH_ISSUES_QUERY
+# @brief GraphQL query for open issues matching a search
+# @details
+# Used for the (rare) repositories with more than the 100 open issues
+# REPOSITORIES_QUERY returns.
+SEARCH_ISSUES_QUERY = """
+query($query: String!) {
+  search(type: ISSUE, query: $query, first: 100) {
+    nodes { ... on Issue { number title } }
+  }
+}
+"""
+
+##
+# @var str BLOBS_QUERY
+# @brief GraphQL query for the text of a batch of blobs
+BLOBS_QUERY = """
+query($ids: [ID!]!) {
+  nodes(ids: $ids) { ... on Blob { text } }
+}
+"""
+
+##
+# @var str CREATE_ISSUE_MUTATION
+# @brief one aliased createIssue field of a batched GraphQL mutation
+# @details
+# The input for `mN` is passed as the `$inputN` variable, so titles and
+# bodies never need escaping.
+CREATE_ISSUE_MUTATION = """
+  m{index}: createIssue(input: $input{index}) {{ issue {{ number }} }}"""
+
+
 def is_dry_run(value=DRY_RUN):
     """
     @fn is_dry_run()
@@ -139,7 +263,7 @@ def is_dry_run(value=DRY_RUN):
     @endcode
     """
 
-    normalized_value = value.lower()
+    normalized_value = value.strip().lower()
 
     if normalized_value in ("true", "yes"):
         return True
@@ -149,6 +273,319 @@ def is_dry_run(value=DRY_RUN):
     return True
 
 
+##
+# @var bool DRY_RUN_ENABLED
+# @brief DRY_RUN as evaluated by is_dry_run(), computed once at startup
+DRY_RUN_ENABLED = is_dry_run()
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(filename):
+    """
+    @fn load_template()
+    @brief load and compile a Jinja2 template from TEMPLATES_DIRECTORY
+    @details
+    Jinja2 is only needed to create or close issues, so it's imported
+    here; templates are cached, so each is compiled once per run.
+    @param filename the name of the template within TEMPLATES_DIRECTORY
+    @returns the compiled jinja2.Template
+    @par Example
+    @code
+    body = load_template(OPEN_ISSUE_BODY_FILENAME).render(repository="org/repo")
+    @endcode
+    """
+
+    # pylint: disable-next=import-outside-toplevel
+    from jinja2 import Environment, FileSystemLoader
+
+    j2_environment = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIRECTORY), autoescape=True
+    )
+
+    return j2_environment.get_template(filename)
+
+
+def load_cache(filename=CACHE_FILENAME):
+    """
+    @fn load_cache()
+    @brief load the cached config validation results from disk
+    @details
+    If caching is disabled or the file can't be read, an empty cache is
+    returned; entries that aren't booleans are dropped.
+    @param filename the file to read (default: CACHE_FILENAME)
+    @returns a dictionary of blob ids to booleans
+    @par Example
+    @code
+    cache = load_cache()
+    @endcode
+    """
+
+    if not filename:
+        return {}
+
+    try:
+        with open(filename, encoding="utf-8") as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        log.debug("unable to read cache from '%s'", filename)
+        return {}
+
+    if not isinstance(cache, dict):
+        return {}
+
+    return {oid: valid for oid, valid in cache.items() if isinstance(valid, bool)}
+
+
+def save_cache(cache, filename=CACHE_FILENAME):
+    """
+    @fn save_cache()
+    @brief write the cached config validation results to disk
+    @details
+    The file (and its directory, if needed) is written under a temporary
+    name and moved into place; nothing is written if caching is disabled.
+    @param cache a dictionary of blob ids to booleans
+    @param filename the file to write (default: CACHE_FILENAME)
+    @par Example
+    @code
+    save_cache(cache)
+    @endcode
+    """
+
+    if not filename:
+        return
+
+    try:
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        with open(f"{filename}.tmp", "w", encoding="utf-8") as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(f"{filename}.tmp", filename)
+    except OSError:
+        log.warning("unable to write cache to '%s'", filename)
+
+
+def issues_by_title(issues):
+    """
+    @fn issues_by_title()
+    @brief index a list of issues by their titles
+    @details
+    Titles can repeat, so each maps to a list of issue numbers.
+    @param issues a list of issue nodes with `number` and `title`
+    @returns a dictionary of titles to lists of issue numbers
+    @par Example
+    @code
+    numbers = issues_by_title(nodes).get(MISSING_ISSUE_TITLE, [])
+    @endcode
+    """
+
+    index = {}
+
+    for issue in issues:
+        index.setdefault(issue["title"], []).append(issue["number"])
+
+    return index
+
+
+def search_pre_commit_issues(session, repository):
+    """
+    @fn search_pre_commit_issues()
+    @brief replace a repository's open issues with those matching the title
+    @details
+    Used for repositories with more open issues than REPOSITORIES_QUERY
+    returns so no matching issue is missed.
+    @param session the requests.Session to use
+    @param repository the repository node to update
+    @par Example
+    @code
+    search_pre_commit_issues(session, repo)
+    @endcode
+    """
+
+    query = (
+        f"repo:{repository['nameWithOwner']} is:issue is:open"
+        f' in:title "{MISSING_ISSUE_TITLE}"'
+    )
+
+    if ISSUE_LABEL:
+        query += f' label:"{ISSUE_LABEL}"'
+
+    repository["issues"] = issues_by_title(
+        graphql_query(session, SEARCH_ISSUES_QUERY, {"query": query})["search"]["nodes"]
+    )
+
+
+def is_valid_pre_commit_config(text):
+    """
+    @fn is_valid_pre_commit_config()
+    @brief determine if the text of a pre-commit config is valid
+    @details
+    A valid config is a YAML document with a non-empty `repos` list.
+    @param text the contents of the config (None for binary files)
+    @retval True if the config is valid
+    @retval False if not
+    @par Example
+    @code
+    if not is_valid_pre_commit_config(text):
+        print("This config won't do anything!")
+    @endcode
+    """
+
+    # PyYAML is only needed for repositories with a config to validate
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    try:
+        # LibYAML's loader is much faster, but PyYAML may be built without it
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        parsed_config = yaml.load(text or "", Loader=loader)
+        if not isinstance(parsed_config, dict) or "repos" not in parsed_config:
+            log.info("invalid pre-commit config -- missing 'repos' dictionary")
+            return False
+
+        if not parsed_config["repos"]:
+            log.info("invalid pre-commit config -- no defined repos")
+            return False
+
+    except yaml.YAMLError:
+        log.info("invalid pre-commit config -- invalid YAML")
+        return False
+
+    return True
+
+
+def check_pre_commit_configs(session, blobs, cache):
+    """
+    @fn check_pre_commit_configs()
+    @brief determine which pre-commit configuration blobs are valid
+    @details
+    Blobs whose oid isn't cached are fetched with a single BLOBS_QUERY
+    and checked; each blob gets an `isValid` member with the result.
+    @param session the requests.Session to use
+    @param blobs a list of blob nodes with `id` and `oid` (updated in place)
+    @param cache a dictionary of blob ids to booleans (updated in place)
+    @par Example
+    @code
+    check_pre_commit_configs(session, [repo["object"]], cache)
+    @endcode
+    """
+
+    missing = {}
+    for blob in blobs:
+        if blob["oid"] not in cache:
+            missing[blob["oid"]] = blob["id"]
+
+    log.debug("%i configs cached, %i to fetch", len(blobs) - len(missing), len(missing))
+
+    if missing:
+        texts = graphql_query(session, BLOBS_QUERY, {"ids": list(missing.values())})
+        for oid, text in zip(missing, texts["nodes"]):
+            cache[oid] = is_valid_pre_commit_config(text["text"] if text else None)
+
+    for blob in blobs:
+        blob["isValid"] = cache[blob["oid"]]
+
+
+def fetch_org_state(org, pat, cache=None):
+    """
+    @fn fetch_org_state()
+    @brief fetch every repository in an organization along with its state
+    @details
+    Page through the organization's repositories with REPOSITORIES_QUERY.
+    Each node comes back with its config blob (None if there isn't one
+    or the path isn't a file) and its open issues, indexed by title (see
+    issues_by_title()).  A page's follow-up queries
+    (check_pre_commit_configs() and search_pre_commit_issues()) run on
+    other threads while the next page is fetched, and the page is
+    yielded once they're done.  The config checks run one page at a
+    time so a blob shared by two pages is only fetched once.
+    @param org the name of the GitHub organization
+    @param pat the Personal Access Token to authenticate with
+    @param cache a dictionary of blob ids to booleans (updated in place)
+    @returns an iterator of repository nodes (dictionaries)
+    @par Example
+    @code
+    for repo in fetch_org_state(ORG, PAT):
+        print(repo["nameWithOwner"])
+    @endcode
+    """
+
+    if cache is None:
+        cache = {}
+
+    session = graphql_session(pat, pool_size=MAX_WORKERS + 2)
+
+    cursor = None
+    pages = []
+
+    with (
+        ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor,
+        ThreadPoolExecutor(max_workers=1) as blob_executor,
+    ):
+        while True:
+            data = graphql_query(
+                session,
+                REPOSITORIES_QUERY,
+                {
+                    "org": org,
+                    "cursor": cursor,
+                    "expression": f"HEAD:{PRE_COMMIT_CONFIG_FILENAME}",
+                    "labels": [ISSUE_LABEL] if ISSUE_LABEL else None,
+                    "label": ISSUE_LABEL,
+                },
+            )
+            page = data["organization"]["repositories"]
+            repositories = [
+                repository
+                for repository in page["nodes"]
+                if not repository["isDisabled"] and not repository["isEmpty"]
+            ]
+            log.debug(
+                "fetched %i repositories (%i disabled or empty)",
+                len(page["nodes"]),
+                len(page["nodes"]) - len(repositories),
+            )
+            follow_ups = []
+
+            for repository in repositories:
+                # a directory or submodule at the path comes back as {}
+                if not repository["object"]:
+                    repository["object"] = None
+
+                if repository["issues"]["pageInfo"]["hasNextPage"]:
+                    follow_ups.append(
+                        executor.submit(search_pre_commit_issues, session, repository)
+                    )
+                else:
+                    repository["issues"] = issues_by_title(
+                        repository["issues"]["nodes"]
+                    )
+
+            blobs = [
+                repository["object"]
+                for repository in repositories
+                if repository["object"] is not None
+                and repository["object"]["byteSize"] > 1
+            ]
+            follow_ups.append(
+                blob_executor.submit(check_pre_commit_configs, session, blobs, cache)
+            )
+            pages.append((repositories, follow_ups))
+
+            if len(pages) > 1:
+                repositories, follow_ups = pages.pop(0)
+                for follow_up in follow_ups:
+                    follow_up.result()
+                yield from repositories
+
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+
+            cursor = page["pageInfo"]["endCursor"]
+
+        for repositories, follow_ups in pages:
+            for follow_up in follow_ups:
+                follow_up.result()
+            yield from repositories
+
+
 def has_pre_commit_issue(repository):
     """
     @fn has_pre_commit_issue()
@@ -156,15 +593,16 @@ def has_pre_commit_issue(repository):
     @details
     Given a repository, determine if it has an issue for
     the creation of a pre-commit configuration by looking
-    through the open issues and seeing if any match the
-    criteria:
+    up its open issues (indexed by title by fetch_org_state())
+    and seeing if any match the criteria:
 
     - issue matches the defined title
 
     Note: the subject much completely match, not just
-    a substring.
+    a substring (the search used for repos with many open
+    issues matches loosely, so this still compares exactly).
 
-    @param repository the repository to scan
+    @param repository the repository node from fetch_org_state()
     @retval True if an open, matching issue exists
     @retval False if not
     @par Example
@@ -174,11 +612,7 @@ def has_pre_commit_issue(repository):
     @endcode
     """
 
-    for issue in repository.get_issues(state="open"):
-        if issue.title == MISSING_ISSUE_TITLE:
-            return True
-
-    return False
+    return MISSING_ISSUE_TITLE in repository["issues"]
 
 
 def has_pre_commit(repository):
@@ -186,12 +620,10 @@ def has_pre_commit(repository):
     @fn has_pre_commit()
     @brief determine if a repo has a non-empty pre-commit config
     @details
-    Given a repository, attempt to fetch the pre-commit configuration
-    file.  If it's successful and the contents of that file aren't
-    empty, return True; if GitHub returns an UnknownObjectException,
-    then we know that the file does not exist, so return False.  For
-    any other exception, just let the exception through.
-    @param repository the repository to check
+    Given a repository node from fetch_org_state(), return False if it
+    has no config blob, if the blob is empty, or if
+    check_pre_commit_configs() found it invalid; otherwise, return True.
+    @param repository the repository node to check
     @retval True if a non-empty pre-commit config file exists
     @retval False if not
     @par Example
@@ -200,32 +632,17 @@ def has_pre_commit(repository):
     @endcode
     """
 
-    try:
-        contents = repository.get_contents(path=PRE_COMMIT_CONFIG_FILENAME)
-
-        if contents.size <= 1:
-            logging.info("pre-commit config is present but empty")
-            return False
-
-        try:
-            parsed_config = yaml.safe_load(base64.b64decode(contents.content))
-            if "repos" not in parsed_config:
-                logging.info("invalid pre-commit config -- missing 'repos' dictionary")
-                return False
-
-            if len(parsed_config["repos"]) == 0:
-                logging.info("invalid pre-commit config -- no defined repos")
-                return False
+    contents = repository["object"]
 
-        except yaml.YAMLError:
-            logging.info("invalid pre-commit config -- invalid YAML")
-            return False
+    if contents is None:
+        log.info("missing pre-commit config")
+        return False
 
-    except UnknownObjectException:
-        logging.info("missing pre-commit config")
+    if contents["byteSize"] <= 1:
+        log.info("pre-commit config is present but empty")
         return False
 
-    return True
+    return contents["isValid"]
 
 
 def create_issue(repository):
@@ -243,36 +660,140 @@ def create_issue(repository):
     @endcode
     """
 
-    j2_environment = Environment(
-        loader=FileSystemLoader(TEMPLATES_DIRECTORY), autoescape=True
-    )
-
-    issue_template = j2_environment.get_template(OPEN_ISSUE_BODY_FILENAME)
-
-    issue_body = issue_template.render(
+    issue_body = load_template(OPEN_ISSUE_BODY_FILENAME).render(
         repository=repository.full_name, filename=PRE_COMMIT_CONFIG_FILENAME
     )
 
-    if not is_dry_run():
+    if not DRY_RUN_ENABLED:
         try:
             if not repository.has_issues:
-                logging.info("repository doesn't support issues")
+                log.info("repository doesn't support issues")
                 return 0
 
-            logging.debug("attempting to create issue")
-            issue = repository.create_issue(title=MISSING_ISSUE_TITLE, body=issue_body)
-            logging.debug("issue created with id %i", issue.id)
+            log.debug("attempting to create issue")
+            issue = repository.create_issue(
+                title=MISSING_ISSUE_TITLE,
+                body=issue_body,
+                labels=[ISSUE_LABEL] if ISSUE_LABEL else NotSet,
+            )
+            log.debug("issue created with id %i", issue.id)
             return issue.number
         except GithubException:
-            logging.error("Issue creation failed due to GitHub Exception")
+            log.error("Issue creation failed due to GitHub Exception")
 
     else:
-        logging.info("dry run, so issue not created")
+        log.info("dry run, so issue not created")
 
     return 0
 
 
-def close_issues(repository):
+def create_issue_batch(session, repos):
+    """
+    @fn create_issue_batch()
+    @brief create the tracking issues for a batch of repositories at once
+    @details
+    One aliased createIssue mutation (see CREATE_ISSUE_MUTATION) per
+    repository is sent in a single GraphQL request.
+    @param session the requests.Session to use
+    @param repos the repository nodes (from fetch_org_state()) that need issues
+    @returns a dictionary of repository full names to the numbers of
+    the issues created (0 if creation failed)
+    @par Example
+    @code
+    created = create_issue_batch(session, repos[:ISSUE_BATCH_SIZE])
+    @endcode
+    """
+
+    created = dict.fromkeys((repo["nameWithOwner"] for repo in repos), 0)
+    variables = {}
+
+    for index, repo in enumerate(repos):
+        variables[f"input{index}"] = {
+            "repositoryId": repo["id"],
+            "title": MISSING_ISSUE_TITLE,
+            "body": load_template(OPEN_ISSUE_BODY_FILENAME).render(
+                repository=repo["nameWithOwner"],
+                filename=PRE_COMMIT_CONFIG_FILENAME,
+            ),
+        }
+        if ISSUE_LABEL:
+            variables[f"input{index}"]["labelIds"] = [repo["label"]["id"]]
+
+    declarations = ", ".join(f"${name}: CreateIssueInput!" for name in variables)
+    fields = "".join(
+        CREATE_ISSUE_MUTATION.format(index=index) for index in range(len(repos))
+    )
+
+    log.debug("attempting to create %i issues", len(repos))
+    try:
+        data = graphql_query(
+            session, f"mutation({declarations}) {{{fields}\n}}", variables, partial=True
+        )
+    except GithubException:
+        log.error("Issue creation failed due to GitHub Exception")
+        return created
+
+    for index, repo in enumerate(repos):
+        result = data.get(f"m{index}")
+        if result and result["issue"]:
+            created[repo["nameWithOwner"]] = result["issue"]["number"]
+        else:
+            log.error("Issue creation failed in '%s'", repo["name"])
+
+    return created
+
+
+def create_issues(github, session, repos):
+    """
+    @fn create_issues()
+    @brief create the tracking issues for a list of repositories
+    @details
+    Issues are created ISSUE_BATCH_SIZE at a time (see
+    create_issue_batch()), waiting DELAY seconds per issue after each
+    batch.  Repositories with issues disabled are skipped.  GraphQL
+    can't add a label that doesn't exist yet, so when a repository
+    lacks ISSUE_LABEL, create_issue() (REST) is used instead.
+    @param github the Github object to use for REST fallbacks
+    @param session the requests.Session to use for GraphQL
+    @param repos the repository nodes (from fetch_org_state()) that need issues
+    @returns a dictionary of repository full names to the numbers of
+    the issues created (0 if creation failed or was skipped)
+    @par Example
+    @code
+    created = create_issues(github, session, repos)
+    @endcode
+    """
+
+    created = {}
+    batch = []
+
+    for repo in repos:
+        created[repo["nameWithOwner"]] = 0
+
+        if not repo["hasIssuesEnabled"]:
+            log.info("'%s' doesn't support issues", repo["name"])
+        elif DRY_RUN_ENABLED:
+            log.info("dry run, so issue not created")
+        elif ISSUE_LABEL and repo["label"] is None:
+            repository = github.get_repo(repo["nameWithOwner"])
+            created[repo["nameWithOwner"]] = create_issue(repository)
+        else:
+            batch.append(repo)
+
+    for start in range(0, len(batch), ISSUE_BATCH_SIZE):
+        if start:
+            time.sleep(DELAY * ISSUE_BATCH_SIZE)
+
+        chunk = batch[start : start + ISSUE_BATCH_SIZE]
+        log.info(
+            "creating issues %i-%i of %i", start + 1, start + len(chunk), len(batch)
+        )
+        created.update(create_issue_batch(session, chunk))
+
+    return created
+
+
+def close_issues(repository, issue_numbers):
     """
     @fn close_issues()
     @brief scan for open issues; when found, comment on and close them
@@ -280,93 +801,168 @@ def close_issues(repository):
     The tool will create an issue in a repository when there is no
     valid pre-commit configuration file (i.e., it's not present, it's
     not valid YAML, or it's missing the required content) via
-    create_issue().  This does the opposite and searches for open
-    issues and, when found, comments on them and closes them.
-    @param repository the repo to scan and potentially update
+    create_issue().  This does the opposite: given the numbers of the
+    open issues found by fetch_org_state(), it comments on them and
+    closes them.
+    @param repository the repo to update
+    @param issue_numbers the numbers of the issues to close
     @returns the number of issues closed
     @par Example
     @par code
-    if has_issue(repo):
-        close_issues(repo)
+    if has_pre_commit_issue(repo):
+        close_issues(repository, repo["issues"][MISSING_ISSUE_TITLE])
     @par endcode
     """
 
-    j2_environment = Environment(
-        loader=FileSystemLoader(TEMPLATES_DIRECTORY), autoescape=True
-    )
-
-    comment_template = j2_environment.get_template(CLOSE_ISSUE_BODY_FILENAME)
-
-    comment_body = comment_template.render(
+    comment_body = load_template(CLOSE_ISSUE_BODY_FILENAME).render(
         repository=repository.full_name, filename=PRE_COMMIT_CONFIG_FILENAME
     )
 
     closed_issues = 0
 
-    for issue in repository.get_issues(state="open"):
-        if issue.title == MISSING_ISSUE_TITLE:
-            closed_issues += 1
-            logging.info("Closing issue #%i", issue.number)
-
-            if not is_dry_run():
-                try:
-                    logging.debug("  Adding comment")
-                    issue.create_comment(comment_body)
-                    logging.debug("  Marking issue as completed")
-                    issue.edit(state="closed", state_reason="completed")
-                except GithubException:
-                    logging.error("Issue closing failed due to GitHuh Exception")
-            else:
-                logging.info("dry run, so issue not closed")
+    for issue_number in issue_numbers:
+        closed_issues += 1
+        log.info("Closing issue #%i", issue_number)
+
+        if not DRY_RUN_ENABLED:
+            try:
+                issue = repository.get_issue(issue_number)
+                log.debug("  Adding comment")
+                issue.create_comment(comment_body)
+                log.debug("  Marking issue as completed")
+                issue.edit(state="closed", state_reason="completed")
+            except GithubException:
+                log.error("Issue closing failed due to GitHuh Exception")
+        else:
+            log.info("dry run, so issue not closed")
 
     return closed_issues
 
 
-def main():
+def process_repo(github, repo):
     """
-    @fn main()
-    @brief the main function
+    @fn process_repo()
+    @brief bring a single repository's issue in line with its config
+    @details
+    Close the tracking issues if the repository has a valid config, or
+    note that one is needed (see create_issues()).  This runs on worker
+    threads, so writes are made while holding WRITE_LOCK.
+    @param github the Github object to use for writes
+    @param repo the repository node to process
+    @returns a dictionary with the repository's `name` and `repository`
+    (full name), `has_pre_commit`, `has_issue`, the number of
+    `closed_issues`, and `created_issue` (set by main(); None if no
+    issue was needed)
+    @par Example
+    @code
+    report(process_repo(github, repo))
+    @endcode
     """
 
-    logging.debug('Using PAT "%s**************************"', PAT[:8])
-    logging.debug('Using ORG "%s"', ORG)
+    outcome = {
+        "name": repo["name"],
+        "repository": repo["nameWithOwner"],
+        "has_pre_commit": has_pre_commit(repo),
+        "has_issue": has_pre_commit_issue(repo),
+        "closed_issues": 0,
+        "created_issue": None,
+    }
+
+    if outcome["has_pre_commit"]:
+        log.info("'%s' has pre-commit", repo["name"])
+        if outcome["has_issue"]:
+            repository = github.get_repo(repo["nameWithOwner"])
+            with WRITE_LOCK:
+                outcome["closed_issues"] = close_issues(
+                    repository, repo["issues"][MISSING_ISSUE_TITLE]
+                )
+    else:
+        log.info("'%s' does NOT have pre-commit", repo["name"])
+        if outcome["has_issue"]:
+            log.info("'%s' has issue", repo["name"])
+        else:
+            log.info("'%s' NEEDS issue", repo["name"])
 
-    logging.basicConfig(level=logging.INFO)
-    github = Github(login_or_token=PAT, base_url=API_URL)
+    return outcome
 
-    organization_object = github.get_organization(ORG)
 
-    repos = organization_object.get_repos()
+def report(outcome, output_format=OUTPUT_FORMAT):
+    """
+    @fn report()
+    @brief print the outcome of processing a repository
+    @details
+    In the "jsonl" format every outcome is written as a line of JSON;
+    otherwise, only repositories that needed an issue are reported.
+    @param outcome the dictionary returned by process_repo()
+    @param output_format "text" or "jsonl" (default: OUTPUT_FORMAT)
+    @par Example
+    @code
+    report(process_repo(github, repo))
+    @endcode
+    """
 
-    repo_count = 0
-    repo_total = repos.totalCount
+    if output_format == "jsonl":
+        sys.stdout.write(json.dumps(outcome) + "\n")
+    elif outcome["created_issue"] == 0:
+        print(f"No issue created in {outcome['name']}")
+    elif outcome["created_issue"] is not None:
+        print(f"Created {ORG}/{outcome['name']}#{outcome['created_issue']}")
 
-    for repo in repos:
-        repo_count += 1
 
-        logging.info("%i / %i: '%s'", repo_count, repo_total, repo.name)
+def main():
+    """
+    @fn main()
+    @brief the main function
+    """
 
-        if repo.archived:
-            logging.info("  repo is archived; skipping")
-        else:
-            if has_pre_commit(repo):
-                logging.info("  has pre-commit")
-                if has_pre_commit_issue(repo):
-                    close_issues(repo)
-            else:
-                logging.info("  Does NOT have pre-commit")
-                if has_pre_commit_issue(repo):
-                    logging.info("    has issue")
-                else:
-                    logging.info("    NEEDS issue")
-                    issue_id = create_issue(repo)
-
-                    if issue_id == 0:
-                        print(f"No issue created in {repo.name}")
-                    else:
-                        print(f"Created {ORG}/{repo.name}#{issue_id}")
-        if repo_count != repo_total:
-            time.sleep(DELAY)
+    log.debug('Using PAT "%s**************************"', PAT[:8])
+    log.debug('Using ORG "%s"', ORG)
+
+    github = Github(
+        login_or_token=PAT,
+        base_url=API_URL,
+        lazy=True,
+        pool_size=MAX_WORKERS,
+        seconds_between_writes=DELAY,
+    )
+
+    cache = load_cache()
+    repos = []
+    futures = []
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for repo in fetch_org_state(ORG, PAT, cache):
+            repos.append(repo)
+            futures.append(executor.submit(process_repo, github, repo))
+
+        save_cache(
+            {
+                repo["object"]["oid"]: cache[repo["object"]["oid"]]
+                for repo in repos
+                if repo["object"] is not None and repo["object"]["oid"] in cache
+            }
+        )
+
+        repo_total = len(futures)
+        outcomes = []
+
+        for repo_count, future in enumerate(futures, start=1):
+            outcomes.append(future.result())
+            log.info("%i / %i: '%s'", repo_count, repo_total, outcomes[-1]["name"])
+
+    created = create_issues(
+        github,
+        graphql_session(PAT, idempotent=False),
+        [
+            repo
+            for repo, outcome in zip(repos, outcomes)
+            if not outcome["has_pre_commit"] and not outcome["has_issue"]
+        ],
+    )
+
+    for outcome in outcomes:
+        outcome["created_issue"] = created.get(outcome["repository"])
+        report(outcome)
 
 
 if __name__ == "__main__":